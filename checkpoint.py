@@ -0,0 +1,147 @@
+import struct
+import random
+
+import simulator
+
+# --- Binary Layout (little-endian) ---
+# header | rng state | vehicles (fixed-size records) | queue entries (length-prefixed utf-8)
+MAGIC = b"TQSC"
+VERSION = 1
+
+# magic, version, sim_time, current_light, next_light, light_phase, target_phase,
+# is_transitioning, priority_lane, last_light_switch_time, vehicle count, queue count
+HEADER = struct.Struct("<4sHqbbbb?bqII")
+
+# Mersenne Twister words + index, then gauss_next (flag, value)
+RNG_STATE = struct.Struct("<625I?d")
+
+# x, y, speed, lane, path_option, body_color (r, g, b), active, horizontal,
+# turning, t, t_speed, p0, p1, p2, target_lane, target_horizontal,
+# spawn_time, wait_start, wait_total, origin_lane
+VEHICLE = struct.Struct("<3d2B3B3?2d6dB?3qB")
+
+QUEUE_ENTRY = struct.Struct("<H")
+
+def pack_vehicles_into(buf, offset, vehicles):
+    for v in vehicles:
+        VEHICLE.pack_into(buf, offset,
+                          v.x, v.y, v.speed, v.lane, v.path_option, *v.body_color,
+                          v.active, v.horizontal, v.turning, v.t, v.t_speed,
+                          *v.p0, *v.p1, *v.p2, v.target_lane, v.target_horizontal,
+                          v.spawn_time, v.wait_start, v.wait_total, v.origin_lane)
+        offset += VEHICLE.size
+
+def pack_vehicles(vehicles):
+    buf = bytearray(VEHICLE.size * len(vehicles))
+    pack_vehicles_into(buf, 0, vehicles)
+    return bytes(buf)
+
+def unpack_vehicles(data):
+    vehicles = []
+    for rec in VEHICLE.iter_unpack(data):
+        v = simulator.Vehicle()
+        (v.x, v.y, v.speed, v.lane, v.path_option) = rec[0:5]
+        v.body_color = rec[5:8]
+        (v.active, v.horizontal, v.turning, v.t, v.t_speed) = rec[8:13]
+        v.p0 = rec[13:15]
+        v.p1 = rec[15:17]
+        v.p2 = rec[17:19]
+        (v.target_lane, v.target_horizontal,
+         v.spawn_time, v.wait_start, v.wait_total, v.origin_lane) = rec[19:25]
+        vehicles.append(v)
+    return vehicles
+
+def dumps():
+    # Snapshot of the live simulator state as bytes
+    state = simulator.capture_state()
+    vehicles = state["active_vehicles"]
+    with simulator.vehicle_queue_lock:
+        pending = [entry.encode("utf-8") for entry in state["vehicle_queue"]]
+
+    size = HEADER.size + RNG_STATE.size + VEHICLE.size * len(vehicles)
+    size += sum(QUEUE_ENTRY.size + len(entry) for entry in pending)
+    buf = bytearray(size)
+
+    HEADER.pack_into(buf, 0, MAGIC, VERSION,
+                     state["sim_time"], state["current_light"], state["next_light"],
+                     state["light_phase"], state["target_phase"], state["is_transitioning"],
+                     state["priority_lane"], state["last_light_switch_time"],
+                     len(vehicles), len(pending))
+    offset = HEADER.size
+
+    _, words, gauss_next = random.getstate()
+    RNG_STATE.pack_into(buf, offset, *words, gauss_next is not None, gauss_next or 0.0)
+    offset += RNG_STATE.size
+
+    pack_vehicles_into(buf, offset, vehicles)
+    offset += VEHICLE.size * len(vehicles)
+
+    for entry in pending:
+        QUEUE_ENTRY.pack_into(buf, offset, len(entry))
+        offset += QUEUE_ENTRY.size
+        buf[offset:offset + len(entry)] = entry
+        offset += len(entry)
+
+    return bytes(buf)
+
+def loads(data):
+    # Replace the live simulator state with a snapshot produced by dumps()
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError("Checkpoint is truncated")
+    (magic, version, sim_time, current_light, next_light, light_phase, target_phase,
+     is_transitioning, priority_lane, last_light_switch_time,
+     n_vehicles, n_queue) = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a simulator checkpoint")
+    if version != VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {version}")
+    offset = HEADER.size
+
+    # Parse and bounds-check everything before touching any live state
+    if len(view) < offset + RNG_STATE.size:
+        raise ValueError("Checkpoint is truncated")
+    rng = RNG_STATE.unpack_from(view, offset)
+    offset += RNG_STATE.size
+
+    end = offset + VEHICLE.size * n_vehicles
+    if len(view) < end:
+        raise ValueError("Checkpoint is truncated")
+    vehicles = unpack_vehicles(view[offset:end])
+    offset = end
+
+    pending = []
+    for _ in range(n_queue):
+        if len(view) < offset + QUEUE_ENTRY.size:
+            raise ValueError("Checkpoint is truncated")
+        (length,) = QUEUE_ENTRY.unpack_from(view, offset)
+        offset += QUEUE_ENTRY.size
+        if len(view) < offset + length:
+            raise ValueError("Checkpoint is truncated")
+        pending.append(str(view[offset:offset + length], "utf-8"))
+        offset += length
+
+    random.setstate((3, rng[:625], rng[626] if rng[625] else None))
+    with simulator.vehicle_queue_lock:
+        simulator.restore_state({
+            "sim_time": sim_time,
+            "current_light": current_light,
+            "next_light": next_light,
+            "light_phase": light_phase,
+            "target_phase": target_phase,
+            "is_transitioning": is_transitioning,
+            "priority_lane": priority_lane,
+            "last_light_switch_time": last_light_switch_time,
+            "active_vehicles": vehicles,
+            "vehicle_queue": pending,
+        })
+
+def save_checkpoint(path):
+    data = dumps()
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        loads(f.read())
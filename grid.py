@@ -0,0 +1,237 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+import simulator
+import checkpoint
+
+# --- Constants ---
+TICK_MS = 16
+ARRIVAL_RATE = 0.5 # vehicles per second per boundary approach
+
+# Spawnable lanes per approach (0=A top, 1=B bottom, 2=C right, 3=D left)
+ENTRY_LANES = [[2, 3], [4, 5], [8, 9], [10, 11]]
+
+# Every intersection uses the single-intersection coordinates. A vehicle
+# leaves along its lane's direction and re-enters the neighbour on the same
+# lane: A (1-3) moves down, B (4-6) up, C (7-9) left, D (10-12) right.
+EXIT_OFFSETS = [(1, 0), (-1, 0), (0, -1), (0, 1)]
+
+# --- Helpers ---
+
+def exit_neighbor(rows, cols, node, v):
+    # Node the vehicle drives into next, or -1 if it leaves the network
+    r, c = divmod(node, cols)
+    dr, dc = EXIT_OFFSETS[(v.lane - 1) // 3]
+    r += dr
+    c += dc
+    if 0 <= r < rows and 0 <= c < cols:
+        return r * cols + c
+    return -1
+
+def split_regions(rows, cols, workers):
+    # Contiguous row-major blocks keep most neighbours in the same process
+    nodes = rows * cols
+    workers = max(1, min(workers, nodes))
+    base, extra = divmod(nodes, workers)
+    regions = []
+    start = 0
+    for w in range(workers):
+        size = base + (1 if w < extra else 0)
+        regions.append(list(range(start, start + size)))
+        start += size
+    return regions
+
+# --- Classes ---
+
+class BoundaryArrivals:
+    # Poisson arrivals on the approaches that face the edge of the network
+    def __init__(self, rows, cols, node, rate):
+        r, c = divmod(node, cols)
+        edges = [r == 0, r == rows - 1, c == cols - 1, c == 0]
+        self.rate = rate
+        self.approaches = [[0.0, ENTRY_LANES[i]] for i in range(4) if edges[i]]
+        for a in self.approaches:
+            a[0] = self._gap()
+
+    def _gap(self):
+        return random.expovariate(self.rate) * 1000.0 if self.rate > 0 else float("inf")
+
+    def __call__(self, now):
+        lanes = []
+        for a in self.approaches:
+            while a[0] <= now:
+                lanes.append(random.choice(a[1]))
+                a[0] += self._gap()
+        return lanes
+
+
+def region_worker(conn, rows, cols, region, rate, seed, tick_ms):
+    # Owns the intersections in region. Each message from the coordinator is
+    # the batch of vehicles entering this region; the reply is the batch
+    # leaving it plus this tick's network exits. Every node has its own RNG,
+    # swapped in with its state, so traffic does not depend on the partitioning.
+    simulator.VERBOSE = False
+
+    states = {}
+    arrivals = {}
+    incoming = {}
+    for node in region:
+        random.seed(f"{seed}-{node}")
+        states[node] = simulator.initial_state()
+        arrivals[node] = BoundaryArrivals(rows, cols, node, rate)
+        states[node]["rng"] = random.getstate()
+        incoming[node] = []
+    now = 0
+
+    while True:
+        batch = conn.recv()
+        if batch is None:
+            break
+        for node, data in batch:
+            incoming[node].extend(checkpoint.unpack_vehicles(data))
+
+        now += tick_ms
+        outgoing = {}
+        local = []
+        exits = 0
+        delay_total = 0
+        wait_total = 0
+        active = 0
+
+        for node in region:
+            simulator.restore_state(states[node])
+            random.setstate(states[node]["rng"])
+
+            for v in incoming[node]:
+                simulator.place_vehicle(v, v.lane)
+                simulator.active_vehicles.append(v)
+            incoming[node] = []
+
+            lanes = arrivals[node](now)
+            if lanes:
+                simulator.vehicle_queue.extend(str(lane) for lane in lanes)
+
+            for v in simulator.step(now):
+                dest = exit_neighbor(rows, cols, node, v)
+                if dest == -1:
+                    exits += 1
+                    delay_total += v.exit_time - v.spawn_time
+                    wait_total += v.wait_total
+                elif dest in incoming:
+                    local.append((dest, v))
+                else:
+                    outgoing.setdefault(dest, []).append(v)
+
+            states[node] = simulator.capture_state()
+            states[node]["rng"] = random.getstate()
+            active += len(simulator.active_vehicles)
+
+        # Vehicles moving within the region enter next tick, like remote ones
+        for dest, v in local:
+            incoming[dest].append(v)
+
+        out = [(dest, checkpoint.pack_vehicles(vs)) for dest, vs in outgoing.items()]
+        conn.send((out, exits, delay_total, wait_total, active))
+
+    conn.close()
+
+
+class GridSimulation:
+    # rows x cols intersections split into regions, one worker process each.
+    # Vehicles crossing a region boundary are exchanged once per tick.
+    def __init__(self, rows, cols, workers=None, rate=ARRIVAL_RATE, seed=None, tick_ms=TICK_MS):
+        self.rows = rows
+        self.cols = cols
+        self.tick_ms = tick_ms
+        self.regions = split_regions(rows, cols, workers or os.cpu_count() or 1)
+        self.owner = {}
+        for w, region in enumerate(self.regions):
+            for node in region:
+                self.owner[node] = w
+
+        if seed is None:
+            seed = random.randrange(1 << 30)
+        self.conns = []
+        self.procs = []
+        for w, region in enumerate(self.regions):
+            parent, child = multiprocessing.Pipe()
+            p = multiprocessing.Process(target=region_worker, daemon=True,
+                                        args=(child, rows, cols, region, rate, seed, tick_ms))
+            p.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(p)
+
+        self.inbound = [[] for _ in self.regions]
+        self.sim_time = 0
+        self.exits = 0
+        self.delay_total = 0
+        self.wait_total = 0
+        self.active = 0
+
+    def tick(self):
+        for conn, batch in zip(self.conns, self.inbound):
+            conn.send(batch)
+        self.inbound = [[] for _ in self.regions]
+
+        active = 0
+        for conn in self.conns:
+            out, exits, delay_total, wait_total, region_active = conn.recv()
+            for dest, data in out:
+                self.inbound[self.owner[dest]].append((dest, data))
+            self.exits += exits
+            self.delay_total += delay_total
+            self.wait_total += wait_total
+            active += region_active
+        self.active = active
+        self.sim_time += self.tick_ms
+
+    def run(self, duration_ms):
+        end = self.sim_time + duration_ms
+        while self.sim_time < end:
+            self.tick()
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+            conn.close()
+        for p in self.procs:
+            p.join()
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a grid of intersections across worker processes")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of region processes (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=60.0, metavar="SECONDS",
+                        help="simulated time to run (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=ARRIVAL_RATE,
+                        help="arrivals per second on each boundary approach (default: %(default)s)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    grid = GridSimulation(args.rows, args.cols, args.workers, args.rate, args.seed)
+    print(f"{args.rows}x{args.cols} grid on {len(grid.regions)} worker processes")
+
+    t0 = time.perf_counter()
+    try:
+        grid.run(int(args.duration * 1000))
+    finally:
+        grid.close()
+    elapsed = time.perf_counter() - t0
+
+    mean_delay = grid.delay_total / grid.exits if grid.exits else 0.0
+    mean_wait = grid.wait_total / grid.exits if grid.exits else 0.0
+    print(f"Simulated {args.duration:.1f} s in {elapsed:.2f} s")
+    print(f"Vehicles left the network: {grid.exits} "
+          f"(mean travel {mean_delay / 1000:.1f} s, mean waiting {mean_wait / 1000:.1f} s)")
+    print(f"Vehicles still in the network: {grid.active}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+
+import simulator
+import checkpoint
+from trafficgenerator import SimulatedArrivals
+
+# --- Constants ---
+TICK_MS = 16
+
+# --- Engine ---
+
+def run(duration_ms, tick_ms=TICK_MS, feed=None, recorder=None, realtime=False):
+    # Advance the simulator without a window. feed(now) returns lanes to spawn;
+    # with realtime=True each tick is paced to the wall clock so socket clients
+    # see the same frame rate as the windowed simulator.
+    end = simulator.sim_time + duration_ms
+    wall_start = time.monotonic()
+    sim_start = simulator.sim_time
+
+    while simulator.sim_time < end:
+        now = simulator.sim_time + tick_ms
+        if feed:
+            lanes = feed(now)
+            if lanes:
+                with simulator.vehicle_queue_lock:
+                    simulator.vehicle_queue.extend(str(lane) for lane in lanes)
+
+        simulator.step(now, recorder)
+
+        if realtime:
+            ahead = (now - sim_start) / 1000.0 - (time.monotonic() - wall_start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+def start_receiver(host='0.0.0.0', port=simulator.PORT):
+    # Binds before returning so a port that is already in use raises OSError here
+    server = simulator.open_server(host, port)
+    t = threading.Thread(target=simulator.socket_receiver_thread, args=(host, port, server), daemon=True)
+    t.start()
+    return t
+
+# --- Experiments ---
+
+_checkpoint_data = None
+
+def _init_worker(data):
+    global _checkpoint_data
+    _checkpoint_data = data
+    simulator.VERBOSE = False
+
+def _run_experiment(args):
+    experiment, seed = args
+    checkpoint.loads(_checkpoint_data)
+    random.seed(seed)
+    return experiment(seed)
+
+def fork_experiments(data, experiment, seeds, processes=None):
+    # Run experiment(seed) once per seed, each in a worker process that starts
+    # from the same checkpoint bytes. experiment must be a module-level
+    # function; it drives the engine itself (usually through run()) and its
+    # return value is collected in seed order.
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(data,)) as pool:
+        return pool.map(_run_experiment, [(experiment, seed) for seed in seeds])
+
+# --- CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the traffic simulator without a window")
+    parser.add_argument("--duration", type=float, default=60.0, metavar="SECONDS",
+                        help="simulated time to run (default: %(default)s)")
+    parser.add_argument("--restore", metavar="FILE", help="start from a checkpoint")
+    parser.add_argument("--save", metavar="FILE", help="write a checkpoint when the run ends")
+    parser.add_argument("--listen", action="store_true",
+                        help="accept vehicles from trafficgenerator.py instead of the built-in arrivals (runs in real time)")
+    parser.add_argument("--seed", type=int, help="seed for the built-in arrivals")
+    parser.add_argument("--metrics", metavar="DIR", help="record time-series metrics into DIR")
+    parser.add_argument("--metrics-interval", type=int, default=simulator.METRICS_INTERVAL_MS, metavar="MS")
+    parser.add_argument("--verbose", action="store_true", help="print every spawn and light change")
+    args = parser.parse_args()
+
+    simulator.VERBOSE = args.verbose
+
+    if args.restore:
+        t0 = time.perf_counter()
+        checkpoint.load_checkpoint(args.restore)
+        print(f"Restored {args.restore} at {simulator.sim_time} ms "
+              f"({len(simulator.active_vehicles)} vehicles) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    recorder = None
+    if args.metrics:
+        from metrics import MetricsRecorder
+        recorder = MetricsRecorder(args.metrics, args.metrics_interval)
+
+    feed = None
+    if args.listen:
+        try:
+            start_receiver()
+        except OSError as e:
+            parser.exit(1, f"Cannot listen on port {simulator.PORT}: {e}\n")
+    else:
+        feed = SimulatedArrivals(simulator.sim_time)
+
+    t0 = time.perf_counter()
+    run(int(args.duration * 1000), feed=feed, recorder=recorder, realtime=args.listen)
+    print(f"Simulated {args.duration:.1f} s in {time.perf_counter() - t0:.2f} s "
+          f"({len(simulator.active_vehicles)} vehicles active)")
+
+    if recorder:
+        recorder.close()
+    if args.save:
+        size = checkpoint.save_checkpoint(args.save)
+        print(f"Saved checkpoint {args.save} ({size} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import multiprocessing
+import queue
+import random
+import socket
+import time
+from array import array
+
+import simulator
+import headless
+
+# --- Constants ---
+HOST = '127.0.0.1'
+PORT = 5001
+RATES = [50, 100, 200, 400, 800, 1600, 3200] # messages per second, all connections
+STAGE_SECONDS = 3.0
+DRAIN_SECONDS = 2.0
+LATENCY_LIMIT_MS = 100.0
+DELIVERY_RATIO = 0.95
+SEND_INTERVAL = 0.002 # seconds between batches on the client
+CLIENT_TIMEOUT = 10.0 # seconds to wait for a client's counts after the run
+CLIENT_CHECK_MS = 500
+LANES = [2, 3, 4, 5, 8, 9, 10, 11]
+
+# --- Simulator Side ---
+
+class LatencyCollector:
+    # Installed as simulator.latency_probe; one row per spawned test vehicle.
+    # All times are time.time_ns() so client and simulator share a clock.
+    def __init__(self):
+        self.sent = array('q')
+        self.received = array('q')
+        self.dequeued = array('q')
+        self.spawned = array('q')
+
+    def record(self, sent, received, dequeued, spawned):
+        self.sent.append(sent)
+        self.received.append(received)
+        self.dequeued.append(dequeued)
+        self.spawned.append(spawned)
+
+# --- Flood Client ---
+
+def flood_client(host, port, index, connections, procs, rates, stage_seconds, start_ns, results):
+    # Drives connections index, index + procs, ... and sends its share of each
+    # stage's rate in small batches, every line stamped with its send time.
+    socks = []
+    for _ in range(index, connections, procs):
+        for _ in range(100):
+            try:
+                socks.append(socket.create_connection((host, port)))
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        else:
+            raise RuntimeError(f"Could not connect to {host}:{port}")
+
+    share = len(socks) / connections
+    sent = [0] * len(rates)
+    turn = 0
+    while time.time_ns() < start_ns:
+        time.sleep(0.001)
+
+    while True:
+        elapsed = (time.time_ns() - start_ns) / 1e9
+        stage = int(elapsed // stage_seconds)
+        if stage >= len(rates):
+            break
+        # Catch up to the schedule instead of trusting sleep() to be exact
+        count = int(rates[stage] * share * (elapsed - stage * stage_seconds)) - sent[stage]
+        if count > 0:
+            stamp = time.time_ns()
+            batch = "".join(f"{random.choice(LANES)} {stamp}\n" for _ in range(count))
+            socks[turn].sendall(batch.encode())
+            turn = (turn + 1) % len(socks)
+            sent[stage] += count
+        time.sleep(SEND_INTERVAL)
+
+    for s in socks:
+        s.close()
+    results.put(sent)
+
+# --- Analysis ---
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+def reset_simulation():
+    # Fresh intersection for the next stage; pending messages and the clock are
+    # kept so vehicles sent late in the previous stage are still timed
+    state = simulator.initial_state()
+    state["sim_time"] = simulator.sim_time
+    state["last_light_switch_time"] = simulator.sim_time
+    with simulator.vehicle_queue_lock:
+        state["vehicle_queue"] = simulator.vehicle_queue
+        simulator.restore_state(state)
+
+def run_stages(clients, rates, stage_seconds, start_ns):
+    # Runs the simulator in real time until the last stage has drained,
+    # resetting it at every stage boundary so vehicles left over from earlier
+    # stages do not slow down later ones. Returns peak active vehicles per
+    # stage, or None if a client process died.
+    peak_active = [0] * len(rates)
+    stage_ns = int(stage_seconds * 1e9)
+    end_ns = start_ns + len(rates) * stage_ns + int(DRAIN_SECONDS * 1e9)
+    stage = -1
+    next_check = 0
+    while time.time_ns() < end_ns:
+        current = (time.time_ns() - start_ns) // stage_ns
+        if 0 <= current < len(rates) and current != stage:
+            stage = current
+            reset_simulation()
+
+        headless.run(headless.TICK_MS, realtime=True)
+        if 0 <= stage < len(rates):
+            peak_active[stage] = max(peak_active[stage], len(simulator.active_vehicles))
+
+        if simulator.sim_time >= next_check:
+            next_check = simulator.sim_time + CLIENT_CHECK_MS
+            if any(c.exitcode not in (None, 0) for c in clients):
+                return None
+    return peak_active
+
+def summarize(collector, rates, stage_seconds, start_ns, sent_per_stage, peak_active):
+    stage_ns = int(stage_seconds * 1e9)
+    stages = [[] for _ in rates]
+    for i in range(len(collector.sent)):
+        stage = (collector.sent[i] - start_ns) // stage_ns
+        if 0 <= stage < len(rates):
+            stages[stage].append(i)
+
+    rows = []
+    for stage, rate in enumerate(rates):
+        idx = stages[stage]
+        total = sorted((collector.spawned[i] - collector.sent[i]) / 1e6 for i in idx)
+        receive = sorted((collector.received[i] - collector.sent[i]) / 1e6 for i in idx)
+        dequeue = sorted((collector.dequeued[i] - collector.received[i]) / 1e6 for i in idx)
+        spawn = sorted((collector.spawned[i] - collector.dequeued[i]) / 1e6 for i in idx)
+        rows.append({
+            "offered_rate": rate,
+            "sent_rate": sent_per_stage[stage] / stage_seconds,
+            "spawn_rate": len(idx) / stage_seconds,
+            "peak_active": peak_active[stage],
+            "receive_p50_ms": percentile(receive, 50),
+            "dequeue_p50_ms": percentile(dequeue, 50),
+            "spawn_p50_ms": percentile(spawn, 50),
+            "total_p50_ms": percentile(total, 50),
+            "total_p95_ms": percentile(total, 95),
+            "total_p99_ms": percentile(total, 99),
+        })
+    return rows
+
+def saturation_point(rows, latency_limit_ms):
+    # Last stage that spawned DELIVERY_RATIO of what the clients sent within
+    # the latency limit; None if even the first stage failed
+    best = None
+    for row in rows:
+        if row["spawn_rate"] < DELIVERY_RATIO * row["sent_rate"]:
+            break
+        if not row["total_p99_ms"] <= latency_limit_ms:
+            break
+        best = row
+    return best
+
+# --- CLI ---
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+def fail(clients, message):
+    for c in clients:
+        if c.is_alive():
+            c.terminate()
+    raise SystemExit(f"loadtest: {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure spawn latency and ingest ceiling of the headless simulator on loopback")
+    parser.add_argument("--rates", type=positive_int, nargs="+", default=RATES, metavar="RATE",
+                        help="messages per second for each stage (default: %(default)s)")
+    parser.add_argument("--stage-seconds", type=float, default=STAGE_SECONDS)
+    parser.add_argument("--connections", type=positive_int, default=1)
+    parser.add_argument("--client-procs", type=positive_int, default=1,
+                        help="processes sharing the connections (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency-limit", type=float, default=LATENCY_LIMIT_MS, metavar="MS",
+                        help="p99 end-to-end latency that counts as saturated (default: %(default)s)")
+    parser.add_argument("--csv", metavar="FILE", help="write the per-stage results to FILE")
+    args = parser.parse_args()
+
+    if args.stage_seconds <= 0:
+        parser.error("--stage-seconds must be positive")
+
+    procs = min(args.client_procs, args.connections)
+    simulator.VERBOSE = False
+    collector = LatencyCollector()
+    simulator.latency_probe = collector
+    try:
+        headless.start_receiver(HOST, args.port)
+    except OSError as e:
+        parser.exit(1, f"loadtest: cannot listen on {HOST}:{args.port}: {e}\n")
+
+    start_ns = time.time_ns() + 1_000_000_000 # leave a second for clients to connect
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=flood_client, daemon=True,
+                                       args=(HOST, args.port, i, args.connections, procs, args.rates,
+                                             args.stage_seconds, start_ns, results))
+               for i in range(procs)]
+    for c in clients:
+        c.start()
+
+    peak_active = run_stages(clients, args.rates, args.stage_seconds, start_ns)
+    if peak_active is None:
+        fail(clients, "a flood client exited early; see its error above")
+
+    sent_per_stage = [0] * len(args.rates)
+    for _ in clients:
+        try:
+            counts = results.get(timeout=CLIENT_TIMEOUT)
+        except queue.Empty:
+            fail(clients, "no result from a flood client")
+        for stage, count in enumerate(counts):
+            sent_per_stage[stage] += count
+    for c in clients:
+        c.join(CLIENT_TIMEOUT)
+    if any(c.exitcode != 0 for c in clients):
+        fail(clients, "a flood client did not exit cleanly")
+
+    rows = summarize(collector, args.rates, args.stage_seconds, start_ns, sent_per_stage, peak_active)
+
+    print(f"{'offered/s':>10} {'sent/s':>8} {'spawned/s':>10} {'active':>7} {'recv p50':>9} {'queue p50':>10} "
+          f"{'spawn p50':>10} {'e2e p50':>9} {'e2e p95':>9} {'e2e p99':>9}  (ms)")
+    for r in rows:
+        print(f"{r['offered_rate']:>10} {r['sent_rate']:>8.0f} {r['spawn_rate']:>10.0f} {r['peak_active']:>7} "
+              f"{r['receive_p50_ms']:>9.2f} {r['dequeue_p50_ms']:>10.2f} {r['spawn_p50_ms']:>10.3f} "
+              f"{r['total_p50_ms']:>9.2f} {r['total_p95_ms']:>9.2f} {r['total_p99_ms']:>9.2f}")
+
+    best = saturation_point(rows, args.latency_limit)
+    if best:
+        print(f"Saturation point: {best['spawn_rate']:.0f} vehicles/s "
+              f"(p99 {best['total_p99_ms']:.1f} ms, limit {args.latency_limit:.0f} ms)")
+    else:
+        print(f"Saturated at the first stage ({args.rates[0]}/s)")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import json
+import os
+
+import numpy as np
+
+# --- Constants ---
+FORMAT_VERSION = 1
+DEFAULT_INTERVAL_MS = 250
+DEFAULT_CHUNK_ROWS = 4096
+NUM_LANES = 12
+NUM_ROADS = 4 # 0=A, 1=B, 2=C, 3=D
+
+# --- Classes ---
+
+class ColumnTable:
+    # One preallocated chunk per column. Rows are written in place and a full
+    # chunk is appended to "<name>.<column>.bin" before the buffers are reused,
+    # so every column on disk is a plain array that np.memmap can open.
+    # Existing column files are truncated: one directory holds one run.
+    def __init__(self, directory, name, columns, chunk_rows):
+        self.name = name
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.spec = {}
+        self.columns = {}
+        self.files = {}
+        for column, dtype, width in columns:
+            shape = (chunk_rows, width) if width > 1 else (chunk_rows,)
+            self.columns[column] = np.zeros(shape, dtype=dtype)
+            self.spec[column] = {"dtype": np.dtype(dtype).str, "width": width}
+            path = os.path.join(directory, f"{name}.{column}.bin")
+            self.files[column] = open(path, "wb")
+
+    def next_row(self):
+        if self.rows == self.chunk_rows:
+            self.flush()
+        row = self.rows
+        self.rows += 1
+        return row
+
+    def flush(self):
+        if self.rows:
+            for column, buf in self.columns.items():
+                buf[:self.rows].tofile(self.files[column])
+            self.rows = 0
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+class MetricsRecorder:
+    # Samples the simulation into three tables:
+    #   samples - queue length per lane, mean waiting time per road, exits
+    #             since the previous sample, active vehicles, light, priority
+    #   exits   - one row per vehicle leaving the intersection
+    #   phases  - one row per completed light phase (0 = all red)
+    # A vehicle counts as queued while it is held at a stop line or behind
+    # another vehicle (wait_start >= 0).
+    def __init__(self, directory, interval_ms=DEFAULT_INTERVAL_MS, chunk_rows=DEFAULT_CHUNK_ROWS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self.next_sample = 0
+
+        self.samples = ColumnTable(directory, "samples", [
+            ("time_ms", "i8", 1),
+            ("queue_len", "i4", NUM_LANES),
+            ("wait_ms", "f4", NUM_ROADS),
+            ("throughput", "i4", 1),
+            ("active", "i4", 1),
+            ("light", "i1", 1),
+            ("priority_lane", "i1", 1),
+        ], chunk_rows)
+        self.exits = ColumnTable(directory, "exits", [
+            ("spawn_ms", "i8", 1),
+            ("exit_ms", "i8", 1),
+            ("wait_ms", "i8", 1),
+            ("lane", "i1", 1),
+        ], chunk_rows)
+        self.phases = ColumnTable(directory, "phases", [
+            ("start_ms", "i8", 1),
+            ("duration_ms", "i8", 1),
+            ("light", "i1", 1),
+        ], chunk_rows)
+        self.tables = [self.samples, self.exits, self.phases]
+
+        # Scratch space reused by every sample
+        self._lane_counts = [0] * NUM_LANES
+        self._road_wait = [0.0] * NUM_ROADS
+        self._road_held = [0] * NUM_ROADS
+
+        self.exited_since_sample = 0
+        self.phase_light = -1
+        self.phase_start = 0
+
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            "version": FORMAT_VERSION,
+            "interval_ms": self.interval_ms,
+            "tables": {t.name: t.spec for t in self.tables},
+        }
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def sample(self, now, vehicles, light, priority_lane):
+        if now < self.next_sample:
+            return
+        self.next_sample += self.interval_ms
+        if self.next_sample <= now:
+            self.next_sample = now + self.interval_ms
+
+        counts = self._lane_counts
+        wait = self._road_wait
+        held = self._road_held
+        for i in range(NUM_LANES): counts[i] = 0
+        for i in range(NUM_ROADS):
+            wait[i] = 0.0
+            held[i] = 0
+
+        for v in vehicles:
+            if v.wait_start < 0 or not 1 <= v.lane <= 12: continue
+            counts[v.lane - 1] += 1
+            road = (v.lane - 1) // 3
+            wait[road] += now - v.wait_start
+            held[road] += 1
+
+        for i in range(NUM_ROADS):
+            if held[i]: wait[i] /= held[i]
+
+        cols = self.samples.columns
+        row = self.samples.next_row()
+        cols["time_ms"][row] = now
+        # Element by element so no temporary array is built from the lists
+        queue_len = cols["queue_len"]
+        for i in range(NUM_LANES): queue_len[row, i] = counts[i]
+        wait_ms = cols["wait_ms"]
+        for i in range(NUM_ROADS): wait_ms[row, i] = wait[i]
+        cols["throughput"][row] = self.exited_since_sample
+        cols["active"][row] = len(vehicles)
+        cols["light"][row] = light
+        cols["priority_lane"][row] = priority_lane
+        self.exited_since_sample = 0
+
+    def record_exit(self, v):
+        cols = self.exits.columns
+        row = self.exits.next_row()
+        cols["spawn_ms"][row] = v.spawn_time
+        cols["exit_ms"][row] = v.exit_time
+        cols["wait_ms"][row] = v.wait_total
+        cols["lane"][row] = v.origin_lane
+        self.exited_since_sample += 1
+
+    def record_phase(self, now, light):
+        if light == self.phase_light:
+            return
+        if self.phase_light != -1:
+            cols = self.phases.columns
+            row = self.phases.next_row()
+            cols["start_ms"][row] = self.phase_start
+            cols["duration_ms"][row] = now - self.phase_start
+            cols["light"][row] = self.phase_light
+        self.phase_light = light
+        self.phase_start = now
+
+    def flush(self):
+        for t in self.tables:
+            t.flush()
+
+    def close(self):
+        for t in self.tables:
+            t.close()
+
+# --- Loading ---
+
+def load_metrics(directory):
+    # Returns {table: {column: array}}; columns are memory-mapped read-only.
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported metrics format version: {meta.get('version')}")
+
+    tables = {}
+    for name, spec in meta["tables"].items():
+        tables[name] = {}
+        for column, info in spec.items():
+            dtype = np.dtype(info["dtype"])
+            width = info["width"]
+            path = os.path.join(directory, f"{name}.{column}.bin")
+            rows = os.path.getsize(path) // (dtype.itemsize * width)
+            shape = (rows, width) if width > 1 else (rows,)
+            if rows == 0:
+                tables[name][column] = np.zeros(shape, dtype=dtype)
+            else:
+                tables[name][column] = np.memmap(path, dtype=dtype, mode="r", shape=shape)
+    return tables
@@ -5,6 +5,8 @@ import random
 import threading
 import socket
 import sys
+import argparse
+import time
 
 # --- Constants ---
 PORT = 5000
@@ -13,6 +15,7 @@ WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 800
 ROAD_WIDTH = 150
 LANE_WIDTH = 50
+METRICS_INTERVAL_MS = 250
 
 # --- Globals ---
 current_light = 0 # 1=A, 2=B, 3=C, 4=D
@@ -21,6 +24,23 @@ vehicle_queue = []
 vehicle_queue_lock = threading.Lock()
 active_vehicles = []
 lock = threading.Lock()
+sim_time = 0 # ms, updated once per frame
+VERBOSE = True
+latency_probe = None # set by loadtest.py
+
+# Signal Controller
+light_phase = 1 # 1=A, 2=B...
+target_phase = 1
+is_transitioning = False
+priority_lane = -1
+last_light_switch_time = 0
+
+# Everything capture_state()/restore_state() swap in and out
+STATE_GLOBALS = (
+    "sim_time", "current_light", "next_light",
+    "light_phase", "target_phase", "is_transitioning", "priority_lane", "last_light_switch_time",
+    "active_vehicles", "vehicle_queue",
+)
 
 # --- Classes ---
 
@@ -45,44 +65,70 @@ class Vehicle:
         self.target_lane = 0
         self.target_horizontal = False
 
+        # Timing (ms, simulation clock)
+        self.spawn_time = 0
+        self.exit_time = -1
+        self.wait_start = -1 # -1 while moving
+        self.wait_total = 0
+        self.origin_lane = 0
+
 # --- Socket Server ---
-def socket_receiver_thread():
+def open_server(host='0.0.0.0', port=PORT):
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        server.bind(('0.0.0.0', PORT))
+        server.bind((host, port))
         server.listen(3)
-        print(f"Server listening on port {PORT}...")
+    except OSError:
+        server.close()
+        raise
+    return server
+
+def socket_receiver_thread(host='0.0.0.0', port=PORT, server=None):
+    try:
+        if server is None:
+            server = open_server(host, port)
+        print(f"Server listening on port {port}...")
         
         while True:
             conn, addr = server.accept()
             print("Client connected (Traffic Generator)...")
-            with conn:
-                buffer = ""
-                while True:
-                    data = conn.recv(1024)
-                    if not data:
-                        print("Client disconnected.")
-                        break
-                    
-                    try:
-                        buffer += data.decode('utf-8')
-                        while "\n" in buffer:
-                            line, buffer = buffer.split("\n", 1)
-                            line = line.strip()
-                            if line.isdigit():
-                                with vehicle_queue_lock:
-                                    vehicle_queue.append(line)
-                                print(f"Received: {line} (Queue: {len(vehicle_queue)})")
-                    except Exception as e:
-                        print(f"Error parsing socket data: {e}")
-
-            print("Waiting for new connection...")
+            threading.Thread(target=client_thread, args=(conn,), daemon=True).start()
             
     except Exception as e:
         print(f"Socket Server Error: {e}")
 
+def client_thread(conn):
+    # Lines are "<lane>" or "<lane> <send time ns>"; stamped lines get the
+    # receive time appended so process_vehicle_queue can report latencies.
+    with conn:
+        buffer = ""
+        while True:
+            data = conn.recv(1024)
+            if not data:
+                print("Client disconnected.")
+                break
+            
+            try:
+                buffer += data.decode('utf-8')
+                while "\n" in buffer:
+                    line, buffer = buffer.split("\n", 1)
+                    line = line.strip()
+                    lane, _, sent = line.partition(" ")
+                    if lane.isdigit():
+                        if sent:
+                            line = f"{lane} {sent} {time.time_ns()}"
+                        with vehicle_queue_lock:
+                            vehicle_queue.append(line)
+                        log(f"Received: {line} (Queue: {len(vehicle_queue)})")
+            except Exception as e:
+                print(f"Error parsing socket data: {e}")
+
 # --- Helper Functions ---
 
+def log(msg):
+    if VERBOSE:
+        print(msg)
+
 def get_lane_angle(lane):
     if 1 <= lane <= 3: return 90.0
     if 4 <= lane <= 6: return 270.0
@@ -113,7 +159,17 @@ def spawn_vehicle(lane):
     v.body_color = random.choice(colors)
     v.turning = False
     v.t = 0.0
-    
+    v.spawn_time = sim_time
+
+    if not place_vehicle(v, lane):
+        return
+    v.origin_lane = lane
+    active_vehicles.append(v)
+    log(f"Spawned Vehicle: Lane {lane}, Pos ({v.x:.1f}, {v.y:.1f}), Color {v.body_color}")
+    return v
+
+def place_vehicle(v, lane):
+    # Entry point just off-screen for the given lane
     center = WINDOW_WIDTH / 2.0
     road_half = ROAD_WIDTH / 2.0
     
@@ -154,11 +210,10 @@ def spawn_vehicle(lane):
         v.horizontal = True
         
     else:
-        return
+        return False
         
     v.lane = lane
-    active_vehicles.append(v)
-    print(f"Spawned Vehicle: Lane {lane}, Pos ({v.x:.1f}, {v.y:.1f}), Color {v.body_color}")
+    return True
 
 # ... (Previous helper functions remain) ...
 
@@ -213,6 +268,15 @@ def update_vehicles():
         if 10 <= v.lane <= 12 and 280 <= v.x <= 290 and l_state != 4: return False
         return True
 
+    def hold(v):
+        if v.wait_start < 0:
+            v.wait_start = sim_time
+
+    def release(v):
+        if v.wait_start >= 0:
+            v.wait_total += sim_time - v.wait_start
+            v.wait_start = -1
+
     def start_turn(v, t_lane, t_horz, p1x, p1y, p2x, p2y):
         v.turning = True
         v.t = 0.0
@@ -235,13 +299,18 @@ def update_vehicles():
         vec = lane_groups[lane]
         for i, v in enumerate(vec):
             if v.turning: continue
-            if not can_advance(v): continue
+            if not can_advance(v):
+                hold(v)
+                continue
             
             proposed = v.y + v.speed
             if i > 0:
                 front = vec[i-1]
-                if front.y - proposed < min_gap: continue
+                if front.y - proposed < min_gap:
+                    hold(v)
+                    continue
             v.y = proposed
+            release(v)
             
             # Logic: Lane 3 Turn
             if v.lane == 3 and 307.5 <= v.y < 380.0:
@@ -258,13 +327,18 @@ def update_vehicles():
         vec = lane_groups[lane]
         for i, v in enumerate(vec):
             if v.turning: continue
-            if not can_advance(v): continue
+            if not can_advance(v):
+                hold(v)
+                continue
             
             proposed = v.y - v.speed
             if i > 0:
                 front = vec[i-1]
-                if proposed - front.y < min_gap: continue
+                if proposed - front.y < min_gap:
+                    hold(v)
+                    continue
             v.y = proposed
+            release(v)
             
             # Logic Lane 4 Turn
             if v.lane == 4 and 400.0 < v.y <= 467.5:
@@ -282,13 +356,18 @@ def update_vehicles():
         vec = lane_groups[lane]
         for i, v in enumerate(vec):
             if v.turning: continue
-            if not can_advance(v): continue
+            if not can_advance(v):
+                hold(v)
+                continue
             
             proposed = v.x - v.speed
             if i > 0:
                 front = vec[i-1]
-                if proposed - front.x < min_gap: continue
+                if proposed - front.x < min_gap:
+                    hold(v)
+                    continue
             v.x = proposed
+            release(v)
             
             # Logic Lane 9 Turn? C++ uses "moveHorizontal(7,9,false)".
             # In C++ moveHorizontal: lane 9 check
@@ -306,13 +385,18 @@ def update_vehicles():
         vec = lane_groups[lane]
         for i, v in enumerate(vec):
             if v.turning: continue
-            if not can_advance(v): continue
+            if not can_advance(v):
+                hold(v)
+                continue
             
             proposed = v.x + v.speed
             if i > 0:
                 front = vec[i-1]
-                if front.x - proposed < min_gap: continue
+                if front.x - proposed < min_gap:
+                    hold(v)
+                    continue
             v.x = proposed
+            release(v)
             
             # Logic Lane 10
             if v.lane == 10 and 307.5 <= v.x < 380.0:
@@ -343,11 +427,118 @@ def update_vehicles():
                 v.y = uu * v.p0[1] + 2 * u * v.t * v.p1[1] + tt * v.p2[1]
 
     # Remove OOB
-    active_vehicles = [v for v in active_vehicles if -100 <= v.x <= 900 and -100 <= v.y <= 900]
-
-def main():
-    global current_light, next_light
+    remaining = []
+    exited = []
+    for v in active_vehicles:
+        if -100 <= v.x <= 900 and -100 <= v.y <= 900:
+            remaining.append(v)
+        else:
+            v.exit_time = sim_time
+            exited.append(v)
+    active_vehicles = remaining
+    return exited
+
+def process_vehicle_queue():
+    with vehicle_queue_lock:
+        while vehicle_queue:
+            data = vehicle_queue.pop(0)
+            try:
+                if data:
+                    lane, *stamps = data.split()
+                    dequeued = time.time_ns() if stamps else 0
+                    v = spawn_vehicle(int(lane))
+                    if stamps and latency_probe and v:
+                        latency_probe.record(int(stamps[0]), int(stamps[1]), dequeued, time.time_ns())
+            except:
+                pass
+
+def update_signals(current_time):
+    global next_light, light_phase, target_phase, is_transitioning, priority_lane, last_light_switch_time
+
+    # Adaptive Logic
+    if priority_lane == -1:
+        for i in range(4):
+            if count_vehicles_on_road(i) >= 6:
+                priority_lane = i
+                log(f"Priority mode activated for Road {chr(ord('A')+i)}")
+                break
+    else:
+        if count_vehicles_on_road(priority_lane) <= 3:
+            log(f"Priority mode deactivated for Road {chr(ord('A')+priority_lane)}")
+            priority_lane = -1
     
+    if not is_transitioning:
+        target_phase = light_phase
+        if priority_lane != -1:
+            if light_phase != priority_lane + 1:
+                target_phase = priority_lane + 1
+        else:
+            if current_time - last_light_switch_time > 3000:
+                found = False
+                for i in range(1, 5):
+                    chk = (light_phase - 1 + i) % 4
+                    if count_vehicles_on_road(chk) > 0:
+                        target_phase = chk + 1
+                        found = True
+                        break
+                if not found:
+                    target_phase = (light_phase % 4) + 1
+
+    if light_phase != target_phase:
+        if not is_transitioning:
+            is_transitioning = True
+            last_light_switch_time = current_time
+            next_light = 0 # Yellow/All Red
+        else:
+            if current_time - last_light_switch_time > 1000:
+                light_phase = target_phase
+                next_light = light_phase
+                is_transitioning = False
+                last_light_switch_time = current_time
+    else:
+        if not is_transitioning:
+            next_light = light_phase
+
+def step(current_time, recorder=None):
+    # One frame of simulation at current_time (ms), shared by the window and
+    # the headless engine. Returns the vehicles that left this frame.
+    global current_light, sim_time
+    sim_time = current_time
+
+    process_vehicle_queue()
+    update_signals(current_time)
+
+    # Update Physics
+    exited = update_vehicles()
+    if current_light != next_light:
+        current_light = next_light
+        log(f"Light state updated to {current_light}")
+
+    if recorder:
+        for v in exited:
+            recorder.record_exit(v)
+        recorder.record_phase(sim_time, current_light)
+        recorder.sample(sim_time, active_vehicles, current_light, priority_lane)
+    return exited
+
+def initial_state():
+    # State of a freshly started intersection
+    return {
+        "sim_time": 0, "current_light": 0, "next_light": 0,
+        "light_phase": 1, "target_phase": 1, "is_transitioning": False,
+        "priority_lane": -1, "last_light_switch_time": 0,
+        "active_vehicles": [], "vehicle_queue": [],
+    }
+
+def capture_state():
+    # References (not copies) to everything a run needs to resume
+    g = globals()
+    return {name: g[name] for name in STATE_GLOBALS}
+
+def restore_state(state):
+    globals().update({name: state[name] for name in STATE_GLOBALS})
+
+def main(metrics_dir=None, metrics_interval=METRICS_INTERVAL_MS):
     pygame.init()
     pygame.font.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
@@ -355,85 +546,25 @@ def main():
     clock = pygame.time.Clock()
     font = pygame.font.SysFont("Arial", 24)
 
+    recorder = None
+    if metrics_dir:
+        from metrics import MetricsRecorder
+        recorder = MetricsRecorder(metrics_dir, metrics_interval)
+        print(f"Recording metrics to {metrics_dir}")
+
     # Start Receiver
     t = threading.Thread(target=socket_receiver_thread, daemon=True)
     t.start()
-
-    last_light_switch_time = pygame.time.get_ticks()
-    light_phase = 1 # 1=A, 2=B...
-    target_phase = 1
-    is_transitioning = False
-    priority_lane = -1
     
     running = True
     while running:
-        clock.tick(60) # 16ms
+        elapsed = clock.tick(60) # 16ms
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        # Process Queue
-        with vehicle_queue_lock:
-            while vehicle_queue:
-                data = vehicle_queue.pop(0)
-                try:
-                    if data:
-                        spawn_vehicle(int(data))
-                except:
-                    pass
-
-        current_time = pygame.time.get_ticks()
-        
-        # Adaptive Logic
-        if priority_lane == -1:
-            for i in range(4):
-                if count_vehicles_on_road(i) >= 6:
-                    priority_lane = i
-                    print(f"Priority mode activated for Road {chr(ord('A')+i)}")
-                    break
-        else:
-            if count_vehicles_on_road(priority_lane) <= 3:
-                print(f"Priority mode deactivated for Road {chr(ord('A')+priority_lane)}")
-                priority_lane = -1
-        
-        if not is_transitioning:
-            target_phase = light_phase
-            if priority_lane != -1:
-                if light_phase != priority_lane + 1:
-                    target_phase = priority_lane + 1
-            else:
-                if current_time - last_light_switch_time > 3000:
-                    found = False
-                    for i in range(1, 5):
-                        chk = (light_phase - 1 + i) % 4
-                        if count_vehicles_on_road(chk) > 0:
-                            target_phase = chk + 1
-                            found = True
-                            break
-                    if not found:
-                        target_phase = (light_phase % 4) + 1
-
-        if light_phase != target_phase:
-            if not is_transitioning:
-                is_transitioning = True
-                last_light_switch_time = current_time
-                next_light = 0 # Yellow/All Red
-            else:
-                if current_time - last_light_switch_time > 1000:
-                    light_phase = target_phase
-                    next_light = light_phase
-                    is_transitioning = False
-                    last_light_switch_time = current_time
-        else:
-            if not is_transitioning:
-                next_light = light_phase
-                
-        # Update Physics
-        update_vehicles()
-        if current_light != next_light:
-            current_light = next_light
-            print(f"Light state updated to {current_light}")
+        step(sim_time + elapsed, recorder)
 
         # Render
         screen.fill(BG_COLOR)
@@ -568,8 +699,16 @@ def main():
 
         pygame.display.flip()
 
+    if recorder:
+        recorder.close()
+
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Traffic intersection simulator")
+    parser.add_argument("--metrics", metavar="DIR", help="record time-series metrics into DIR")
+    parser.add_argument("--metrics-interval", type=int, default=METRICS_INTERVAL_MS, metavar="MS",
+                        help="sampling interval for --metrics (default: %(default)s)")
+    args = parser.parse_args()
+    main(args.metrics, args.metrics_interval)
@@ -0,0 +1,55 @@
+import random
+import unittest
+
+import simulator
+import checkpoint
+import headless
+from trafficgenerator import SimulatedArrivals
+
+def warm_up(duration_ms):
+    simulator.restore_state(simulator.initial_state())
+    random.seed(1)
+    headless.run(duration_ms, feed=SimulatedArrivals())
+    simulator.vehicle_queue.extend(["2", "5 1718000000000000000 1718000000000500000"])
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        simulator.VERBOSE = False
+        warm_up(60000)
+        self.data = checkpoint.dumps()
+
+    def test_round_trip(self):
+        checkpoint.loads(self.data)
+        self.assertEqual(checkpoint.dumps(), self.data)
+        self.assertEqual(simulator.vehicle_queue[-1], "5 1718000000000000000 1718000000000500000")
+
+    def test_restored_run_continues_identically(self):
+        runs = []
+        for _ in range(2):
+            checkpoint.loads(self.data)
+            headless.run(10000, feed=SimulatedArrivals(simulator.sim_time))
+            runs.append(checkpoint.dumps())
+        self.assertEqual(runs[0], runs[1])
+
+    def test_truncated_checkpoint_is_rejected_without_side_effects(self):
+        checkpoint.loads(self.data)
+        before = checkpoint.dumps()
+        cuts = [0, 10, checkpoint.HEADER.size + 100,
+                checkpoint.HEADER.size + checkpoint.RNG_STATE.size + 10,
+                len(self.data) - 3, len(self.data) - 1]
+        for cut in cuts:
+            with self.subTest(cut=cut):
+                with self.assertRaises(ValueError):
+                    checkpoint.loads(self.data[:cut])
+                self.assertEqual(checkpoint.dumps(), before)
+
+    def test_bad_magic_and_version(self):
+        with self.assertRaises(ValueError):
+            checkpoint.loads(b"XXXX" + self.data[4:])
+        bad_version = bytearray(self.data)
+        bad_version[4:6] = (checkpoint.VERSION + 1).to_bytes(2, "little")
+        with self.assertRaises(ValueError):
+            checkpoint.loads(bytes(bad_version))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -73,6 +73,37 @@ def get_queue(lane):
     if r_id != -1: return road_queues[r_id]
     return None
 
+def pick_lane():
+    # Weighted Random Selection
+    # 60% chance for AL2 (Lane 2), 40% spread among others
+    if random.random() < 0.6:
+        return 2
+    # Other valid lanes excluding 2
+    others = [3, 4, 5, 8, 9, 10, 11]
+    return random.choice(others)
+
+def pick_delay(lane):
+    # Dynamic Delay for Priority Buildup
+    if lane == 2:
+        # Faster bursts for AL2 to trigger priority
+        return random.uniform(0.3, 0.6)
+    # Slower, efficient traffic for others
+    return random.uniform(0.8, 1.3)
+
+class SimulatedArrivals:
+    # Same arrival pattern as generator_loop, driven by simulation time (ms)
+    # instead of sleeping, so the headless engine can run faster than real time.
+    def __init__(self, start_ms=0):
+        self.next_time = start_ms
+        
+    def __call__(self, now):
+        lanes = []
+        while self.next_time <= now:
+            lane = pick_lane()
+            lanes.append(lane)
+            self.next_time += pick_delay(lane) * 1000.0
+        return lanes
+
 def main():
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -90,14 +121,7 @@ def main():
     
     def generator_loop():
         while True:
-            # Weighted Random Selection
-            # 60% chance for AL2 (Lane 2), 40% spread among others
-            if random.random() < 0.6:
-                lane = 2
-            else:
-                # Other valid lanes excluding 2
-                others = [3, 4, 5, 8, 9, 10, 11]
-                lane = random.choice(others)
+            lane = pick_lane()
             
             road = get_road_from_lane(lane)
             v = Vehicle(lane, road)
@@ -106,15 +130,7 @@ def main():
             q.enqueue(v)
             print(f"Generated vehicle for Road {chr(ord('A')+road)} Lane {lane}")
             
-            # Dynamic Delay for Priority Buildup
-            if lane == 2:
-                # Faster bursts for AL2 to trigger priority
-                delay = random.uniform(0.3, 0.6)
-            else:
-                # Slower, efficient traffic for others
-                delay = random.uniform(0.8, 1.3)
-                
-            time.sleep(delay)
+            time.sleep(pick_delay(lane))
 
     t = threading.Thread(target=generator_loop, daemon=True)
     t.start()